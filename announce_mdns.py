@@ -5,11 +5,17 @@ Usage:
 
 The script publishes an A record for specsserver.local and a simple HTTP service _http._tcp.local.
 Ctrl-C to stop.
+
+Clients can use resolve_base_url() to look the service up once instead of
+resolving specsserver.local on every request.
 """
 import argparse
+import asyncio
+import signal
 import socket
-import time
-from zeroconf import IPVersion, ServiceInfo, Zeroconf, NonUniqueNameException
+from urllib.parse import urlsplit
+from zeroconf import IPVersion, ServiceInfo, Zeroconf
+from zeroconf.asyncio import AsyncZeroconf
 
 
 def build_service_info(name: str, ip: str, port: int) -> ServiceInfo:
@@ -29,6 +35,81 @@ def build_service_info(name: str, ip: str, port: int) -> ServiceInfo:
     return info
 
 
+def resolve_service(name: str, timeout: float = 3.0):
+    """Return (ip, port) of the HTTP service advertised as `name`, or None if it doesn't answer."""
+    zeroconf = Zeroconf(ip_version=IPVersion.V4Only)
+    try:
+        info = zeroconf.get_service_info("_http._tcp.local.", f"{name}._http._tcp.local.", timeout=int(timeout * 1000))
+    finally:
+        zeroconf.close()
+    if info is None:
+        return None
+    addresses = info.parsed_addresses(IPVersion.V4Only)
+    if not addresses:
+        return None
+    return addresses[0], info.port
+
+
+def resolve_base_url(base_url: str, timeout: float = 3.0) -> str:
+    """Rewrite http://<name>.local[:port] to http://<ip>:<port>; other URLs are returned unchanged.
+
+    Falls back to the system resolver, and finally to the original URL, if the service isn't found.
+    """
+    parts = urlsplit(base_url)
+    host = parts.hostname or ""
+    if not host.endswith(".local"):
+        return base_url
+    found = resolve_service(host[:-len(".local")], timeout)
+    if found is not None:
+        ip, port = found
+        port = parts.port or port
+    else:
+        try:
+            ip = socket.gethostbyname(host)
+        except OSError:
+            return base_url
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+    return f"{parts.scheme}://{ip}:{port}{parts.path}".rstrip('/')
+
+
+async def advertise(name: str, ip: str, port: int):
+    """Register the service and keep it published until cancelled."""
+    aiozc = AsyncZeroconf(ip_version=IPVersion.V4Only)
+    info = build_service_info(name, ip, port)
+    try:
+        print(f"Registering A record and service for {name}.local -> {ip}:{port}")
+        # On a name conflict zeroconf picks the next free instance name (name-2, ...) itself
+        broadcast = await aiozc.async_register_service(info, allow_name_change=True)
+        await broadcast
+        if info.name != f"{name}._http._tcp.local.":
+            print(f"Name conflict: {name} is already in use. Registered as {info.name}")
+
+        # Additionally register a simple address record by registering a ServiceInfo with no type
+        # Zeroconf does not provide a direct API to register A records alone, but many clients will
+        # learn the host name from the ServiceInfo.server field above. If you need a separate
+        # mDNS A record with no service, consider using low-level mDNS packets or another tool.
+
+        # Sleep until Ctrl-C / SIGTERM instead of waking up periodically
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                # Windows loops have no signal handlers; Ctrl-C cancels this task instead
+                pass
+
+        print("Advertisement active. Press Ctrl-C to stop.")
+        await stop.wait()
+        print("Stopping advertisement...")
+    finally:
+        try:
+            await (await aiozc.async_unregister_service(info))
+        except Exception:
+            pass
+        await aiozc.async_close()
+
+
 def main():
     parser = argparse.ArgumentParser(description="Announce specsserver.local via mDNS")
     parser.add_argument("--ip", required=False, help="IPv4 address to advertise (e.g. 192.168.1.42). If omitted the script will try to auto-detect the primary IPv4.")
@@ -62,40 +143,10 @@ def main():
     except OSError:
         raise SystemExit("Invalid IPv4 address provided: %s" % args.ip)
 
-    zeroconf = Zeroconf(ip_version=IPVersion.V4Only)
-    info = build_service_info(args.name, args.ip, args.port)
-
     try:
-        base_name = args.name
-        attempt = 0
-        while True:
-            try:
-                display_name = info.server.rstrip('.') if info and hasattr(info, 'server') else base_name
-                print(f"Registering A record and service for {display_name}.local -> {args.ip}:{args.port}")
-                zeroconf.register_service(info)
-                break
-            except NonUniqueNameException:
-                attempt += 1
-                new_name = f"{base_name}-{attempt}"
-                print(f"Name conflict: {base_name}.local is already in use. Retrying with {new_name}.local")
-                info = build_service_info(new_name, args.ip, args.port)
-
-        # Additionally register a simple address record by registering a ServiceInfo with no type
-        # Zeroconf does not provide a direct API to register A records alone, but many clients will
-        # learn the host name from the ServiceInfo.server field above. If you need a separate
-        # mDNS A record with no service, consider using low-level mDNS packets or another tool.
-
-        print("Advertisement active. Press Ctrl-C to stop.")
-        while True:
-            time.sleep(1)
+        asyncio.run(advertise(args.name, args.ip, args.port))
     except KeyboardInterrupt:
         print("Stopping advertisement...")
-    finally:
-        try:
-            zeroconf.unregister_service(info)
-        except Exception:
-            pass
-        zeroconf.close()
 
 
 if __name__ == "__main__":
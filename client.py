@@ -1,6 +1,5 @@
 import subprocess
 import requests
-import os
 import cv2 as cv
 import time
 import sys
@@ -12,22 +11,19 @@ except Exception:
     msvcrt = None
 
 
-def take_photo(photo_path, capture):
-    """Read a single frame from an already-open cv2.VideoCapture instance and save it."""
+def grab_jpeg(capture, quality=80):
+    """Read a single frame from an already-open cv2.VideoCapture and return it JPEG-encoded in memory."""
     ret, frame = capture.read()
-    if ret and frame is not None:
-        # ensure folder exists
-        os.makedirs(os.path.dirname(photo_path), exist_ok=True)
-        cv.imwrite(photo_path, frame)
-        return True
-    return False
+    if not ret or frame is None:
+        return None
+    ok, buf = cv.imencode('.jpg', frame, [cv.IMWRITE_JPEG_QUALITY, quality])
+    return buf.tobytes() if ok else None
 
 
-def upload_photo(photo_path, server_url):
+def upload_photo(jpeg_bytes, server_url):
     print(f"Uploading photo to {server_url}...")
-    with open(photo_path, 'rb') as photo_file:
-        files = {'file': photo_file}
-        response = requests.post(server_url, files=files, timeout=15)
+    files = {'file': ('frame.jpg', jpeg_bytes, 'image/jpeg')}
+    response = requests.post(server_url, files=files, timeout=15)
     response.raise_for_status()
     return response.json()
 
@@ -57,8 +53,6 @@ def user_pressed_d() -> bool:
 
 
 def main():
-    folder_path = "temp/images"
-    photo_path = os.path.join(folder_path, "latest.jpg")
     server_base = "http://192.168.29.45:80"  # base URL
     caption_endpoint = "/caption/en"
     ocr_endpoint = "/traffic"
@@ -73,6 +67,7 @@ def main():
 
     try:
         while True:
+            t0 = time.monotonic()
             try:
                 # Default endpoint
                 endpoint = caption_endpoint
@@ -82,22 +77,22 @@ def main():
                     endpoint = ocr_endpoint
                     print("'d' pressed — sending to /ocr/en for this iteration")
 
-                ok = take_photo(photo_path, capture)
-                if not ok:
+                jpeg_bytes = grab_jpeg(capture)
+                if jpeg_bytes is None:
                     print("Warning: failed to capture frame")
                     time.sleep(0.5)
                     continue
 
                 url = server_base + endpoint
-                response = upload_photo(photo_path, url)
+                response = upload_photo(jpeg_bytes, url)
                 # The server returns either 'caption' or 'text' depending on endpoint
                 caption = response.get("caption") or response.get("text") or response.get("message")
                 print(f"Response from {endpoint}: {caption}")
                 if caption:
                     speak_caption(caption)
 
-                # Small delay to avoid hammering the camera/server
-                time.sleep(1)
+                # Pace to at most one capture per second, counting the time the server took
+                time.sleep(max(0.0, 1.0 - (time.monotonic() - t0)))
             except KeyboardInterrupt:
                 print("Exiting client.")
                 break
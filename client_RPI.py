@@ -1,12 +1,22 @@
 import subprocess
 import requests
 import os
+import argparse
 import cv2 as cv
+import numpy as np
 import time
 import sys
 import threading
+from concurrent.futures import ThreadPoolExecutor
 import io
 import tempfile
+import hashlib
+import glob
+
+import tts
+from client_common import (
+    DEFAULT_PREVIEW_SIZE, downscale, encode_jpeg, iter_chunks, make_session, parse_size, resolve_server,
+)
 
 # Try to import RPi.GPIO; if not available (e.g., running on desktop), provide a dummy
 try:
@@ -14,7 +24,7 @@ try:
 except Exception:
     GPIO = None
 
-# TTS helpers - try gTTS+playsound then fall back to espeak
+# TTS helpers - try gTTS+playsound then fall back to espeak (in-process via tts.py when possible)
 try:
     from gtts import gTTS
     from playsound import playsound
@@ -22,30 +32,92 @@ except Exception:
     gTTS = None
     playsound = None
 
+# GStreamer lets us forward the camera's own MJPEG frames without decoding them
+try:
+    import gi
+    gi.require_version('Gst', '1.0')
+    from gi.repository import Gst
+    Gst.init(None)
+except Exception:
+    Gst = None
+
+# Upload workers; matches the session's connection pool so no press opens an extra socket
+UPLOAD_WORKERS = 2
+# Button presses allowed to wait for a worker before further presses are ignored
+MAX_PENDING_UPLOADS = 4
+
+# How long a capture waits for the camera reader to deliver its first frame
+FIRST_FRAME_TIMEOUT = 2.0
+
+# Number of generated gTTS clips kept on disk for repeated phrases
+TTS_CACHE_SIZE = 200
+
+
+def _tts_cache_path(text: str) -> str:
+    key = hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+    return os.path.join(tempfile.gettempdir(), f'tts_{key}.mp3')
+
+
+def _evict_tts_cache():
+    """Remove the least recently played clips beyond TTS_CACHE_SIZE."""
+    clips = glob.glob(os.path.join(tempfile.gettempdir(), 'tts_*.mp3'))
+    if len(clips) <= TTS_CACHE_SIZE:
+        return
+    clips.sort(key=lambda p: os.stat(p).st_mtime if os.path.exists(p) else 0)
+    for path in clips[:-TTS_CACHE_SIZE]:
+        try:
+            os.remove(path)
+        except Exception:
+            pass
 
-def speak(text: str):
-    """Speak the provided text. Try gTTS+playsound, fall back to espeak CLI, else print."""
+
+def open_espeak():
+    """Start a long-lived espeak-ng that speaks each line written to its stdin, or return None."""
+    # No text argument and no --stdin: that is espeak-ng's line-by-line mode. With --stdin
+    # it reads until EOF and would only speak once the pipe is closed.
+    try:
+        return subprocess.Popen(['espeak-ng'], stdin=subprocess.PIPE, text=True, bufsize=1)
+    except Exception:
+        return None
+
+
+def speak(text: str, espeak=None):
+    """Speak the provided text. Try gTTS+playsound (cached per phrase), fall back to espeak, else print.
+
+    espeak runs in-process through libespeak-ng when available; otherwise, if espeak is a
+    process from open_espeak() it is reused instead of starting espeak per call.
+    """
     if not text:
         return
     try:
         if gTTS is not None and playsound is not None:
-            tts = gTTS(text=text, lang='en')
-            fd, path = tempfile.mkstemp(suffix='.mp3')
-            os.close(fd)
-            try:
-                tts.save(path)
-                playsound(path)
-            finally:
+            path = _tts_cache_path(text)
+            if os.path.exists(path):
+                # mark as recently used for eviction
+                os.utime(path)
+            else:
+                fd, tmp = tempfile.mkstemp(suffix='.part', dir=os.path.dirname(path))
+                os.close(fd)
                 try:
-                    os.remove(path)
-                except Exception:
-                    pass
+                    gTTS(text=text, lang='en').save(tmp)
+                    os.replace(tmp, path)
+                finally:
+                    if os.path.exists(tmp):
+                        os.remove(tmp)
+                _evict_tts_cache()
+            playsound(path)
             return
     except Exception:
         pass
 
     # Fallback to espeak
     try:
+        if tts.say(text):
+            return
+        if espeak is not None and espeak.poll() is None:
+            espeak.stdin.write(' '.join(text.splitlines()) + '\n')
+            espeak.stdin.flush()
+            return
         subprocess.run(['espeak', text], check=False)
         return
     except Exception:
@@ -55,34 +127,123 @@ def speak(text: str):
     print(text)
 
 
-def take_photo(photo_path, capture):
-    """Read a single frame from an already-open cv2.VideoCapture instance and save it."""
-    ret, frame = capture.read()
-    if ret and frame is not None:
-        # ensure folder exists
-        os.makedirs(os.path.dirname(photo_path), exist_ok=True)
-        cv.imwrite(photo_path, frame)
-        return True
-    return False
+def mjpeg_pipeline(camera_index=0, width=640, height=480) -> str:
+    """GStreamer pipeline that hands out the camera's MJPEG frames untouched, newest first."""
+    return (
+        f'v4l2src device=/dev/video{camera_index} ! image/jpeg,width={width},height={height} ! '
+        'appsink name=sink emit-signals=true max-buffers=1 drop=true sync=false'
+    )
+
+
+def jetson_jpeg_pipeline(camera_index=0, width=640, height=480) -> str:
+    """GStreamer pipeline for Jetson: frames stay in NVMM memory and nvjpegenc encodes them in hardware."""
+    return (
+        f'v4l2src device=/dev/video{camera_index} ! video/x-raw,width={width},height={height} ! '
+        'nvvidconv ! video/x-raw(memory:NVMM),format=I420 ! nvjpegenc ! '
+        'appsink name=sink emit-signals=true max-buffers=1 drop=true sync=false'
+    )
 
 
-def upload_photo(photo_path, server_url):
+def has_jetson_jpeg() -> bool:
+    """True on CUDA devices whose GStreamer has NVIDIA's nvvidconv and nvjpegenc elements."""
+    if Gst is None:
+        return False
+    try:
+        if cv.cuda.getCudaEnabledDeviceCount() <= 0:
+            return False
+    except Exception:
+        return False
+    return all(Gst.ElementFactory.find(name) is not None for name in ('nvvidconv', 'nvjpegenc'))
+
+
+class GstJpegSource:
+    """Pull already-encoded JPEG frames from a GStreamer pipeline ending in an appsink named 'sink'."""
+
+    def __init__(self, pipeline: str):
+        self.pipeline = Gst.parse_launch(pipeline)
+        self.sink = self.pipeline.get_by_name('sink')
+        if self.pipeline.set_state(Gst.State.PLAYING) == Gst.StateChangeReturn.FAILURE:
+            self.release()
+            raise RuntimeError('Could not start GStreamer pipeline')
+
+    def read(self, timeout=2.0):
+        """Return the newest JPEG frame as bytes, or None if none arrived within timeout seconds."""
+        sample = self.sink.emit('try-pull-sample', int(timeout * Gst.SECOND))
+        if sample is None:
+            return None
+        buf = sample.get_buffer()
+        return buf.extract_dup(0, buf.get_size())
+
+    def release(self):
+        self.pipeline.set_state(Gst.State.NULL)
+
+
+def upload_photo(session, jpeg_bytes, server_url):
     print(f"Uploading photo to {server_url}...")
-    with open(photo_path, 'rb') as photo_file:
-        files = {'file': photo_file}
-        response = requests.post(server_url, files=files, timeout=30)
+    response = session.post(server_url, data=iter_chunks(jpeg_bytes), headers={'Content-Type': 'image/jpeg'}, timeout=30)
     response.raise_for_status()
     return response.json()
 
 
 class RPICaptureClient:
-    def __init__(self, server_base: str, camera_index=0):
-        self.server_base = server_base.rstrip('/')
-        self.photo_folder = os.path.join(tempfile.gettempdir(), 'rpi_client_photos')
-        os.makedirs(self.photo_folder, exist_ok=True)
-        self.photo_path = os.path.join(self.photo_folder, 'latest.jpg')
+    def __init__(self, server_base: str, camera_index=0, preview_size=DEFAULT_PREVIEW_SIZE):
+        self._target = preview_size
+        self._configured_base = server_base.rstrip('/')
+        self._resolve_server()
+        self.session = make_session()
+        self.capture = None
+        self._jpeg_source = None
+
+        # Prefer pipelines that hand us finished JPEGs: MJPEG passthrough skips decode + re-encode
+        # entirely, and on Jetson raw frames are encoded by the hardware JPEG engine
+        candidates = []
+        if Gst is not None:
+            candidates.append(('MJPEG passthrough', mjpeg_pipeline(camera_index)))
+        if has_jetson_jpeg():
+            candidates.append(('Jetson nvjpegenc', jetson_jpeg_pipeline(camera_index)))
+        for label, pipeline in candidates:
+            self._jpeg_source = self._open_jpeg_source(label, pipeline)
+            if self._jpeg_source is not None:
+                break
+
+        if self._jpeg_source is None:
+            self._open_capture(camera_index)
+        elif self._target is not None:
+            # the pipeline's JPEGs are sent untouched, so there is nothing to downscale
+            print('Note: --preview-size has no effect with a GStreamer JPEG source; '
+                  'every upload is sent at the camera resolution')
+
+        # mutex to avoid concurrent captures
+        self.capture_lock = threading.Lock()
+
+        # one espeak-ng process for the client's lifetime (unless libespeak-ng is loaded
+        # in-process); upload workers take turns speaking
+        self._espeak = None if tts.available() else open_espeak()
+        self._speak_lock = threading.Lock()
+
+        # button presses are served by a small fixed pool instead of a thread each
+        self._uploads = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS, thread_name_prefix='upload')
+        self._pending = threading.BoundedSemaphore(MAX_PENDING_UPLOADS)
+
+    @staticmethod
+    def _open_jpeg_source(label: str, pipeline: str):
+        source = None
+        try:
+            source = GstJpegSource(pipeline)
+            if source.read() is None:
+                raise RuntimeError('no frames from camera')
+        except Exception as e:
+            print(f'{label} unavailable ({e})')
+            if source is not None:
+                source.release()
+            return None
+        print(f'Capturing via {label}')
+        return source
 
-        # capture and mutex to avoid concurrent captures
+    def _resolve_server(self):
+        self.server_base = resolve_server(self._configured_base)
+
+    def _open_capture(self, camera_index):
         try:
             self.capture = cv.VideoCapture(camera_index, cv.CAP_V4L2)
         except Exception:
@@ -92,35 +253,125 @@ class RPICaptureClient:
             self.capture.set(cv.CAP_PROP_FRAME_WIDTH, 640)
             self.capture.set(cv.CAP_PROP_FRAME_HEIGHT, 480)
             self.capture.set(cv.CAP_PROP_FOURCC, cv.VideoWriter_fourcc(*'MJPG'))
+            # keep only the newest frame queued in the driver
+            self.capture.set(cv.CAP_PROP_BUFFERSIZE, 1)
         except Exception:
             pass
 
         if not self.capture.isOpened():
             raise RuntimeError('Could not open camera')
 
-        self.capture_lock = threading.Lock()
+        # two reusable frame buffers sized to what the driver actually negotiated:
+        # the reader fills one while the newest complete frame waits in the other
+        width = int(self.capture.get(cv.CAP_PROP_FRAME_WIDTH)) or 640
+        height = int(self.capture.get(cv.CAP_PROP_FRAME_HEIGHT)) or 480
+        self._bufs = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(2)]
+        self._write = 0          # slot the reader fills next
+        self._published = None   # slot holding the newest complete frame
+        self._reading = None     # slot a capture is currently encoding
+
+        # background reader keeps the newest frame so a button press never waits on the driver
+        self._latest_lock = threading.Lock()
+        self._first_frame = threading.Event()
+        self._reader_stop = threading.Event()
+        self._reader = threading.Thread(target=self._read_frames, daemon=True)
+        self._reader.start()
+
+    def _read_frames(self):
+        while not self._reader_stop.is_set():
+            if not self.capture.grab():
+                time.sleep(0.05)
+                continue
+            with self._latest_lock:
+                slot = self._write
+                busy = slot == self._reading
+            if busy:
+                # a capture is still encoding this slot; drop the frame rather than overwrite it
+                continue
+            ret, frame = self.capture.retrieve(self._bufs[slot])
+            # with a destination array OpenCV returns it even when decoding failed
+            if not ret or frame is None:
+                continue
+            # retrieve() only reallocates if the driver changed the frame size
+            self._bufs[slot] = frame
+            with self._latest_lock:
+                self._published = slot
+                self._write = slot ^ 1
+            self._first_frame.set()
 
     def close(self):
+        self._uploads.shutdown(wait=False, cancel_futures=True)
+        if self.capture is not None:
+            self._reader_stop.set()
+            self._reader.join(timeout=1.0)
         try:
-            self.capture.release()
+            if self._jpeg_source is not None:
+                self._jpeg_source.release()
+            if self.capture is not None:
+                self.capture.release()
         except Exception:
             pass
+        if self._espeak is not None:
+            try:
+                self._espeak.stdin.close()
+                self._espeak.wait(timeout=5)
+            except Exception:
+                pass
+        self.session.close()
+
+    def _grab_jpeg(self, full_size=False):
+        if self._jpeg_source is not None:
+            # appsink keeps only the newest frame, so there is nothing stale to drain;
+            # the camera's JPEG is forwarded as-is, so it is never downscaled here
+            return self._jpeg_source.read()
+        if not self._first_frame.wait(FIRST_FRAME_TIMEOUT):
+            return None
+        with self._latest_lock:
+            slot = self._published
+            self._reading = slot
+        try:
+            frame = self._bufs[slot]
+            if not full_size:
+                frame = downscale(frame, self._target)
+            return encode_jpeg(frame)
+        finally:
+            with self._latest_lock:
+                self._reading = None
+
+    def speak(self, text: str):
+        with self._speak_lock:
+            speak(text, self._espeak)
+
+    def submit(self, endpoint: str):
+        """Queue capture_and_send on the upload pool; returns False if too many presses are pending."""
+        if not self._pending.acquire(blocking=False):
+            return False
+        future = self._uploads.submit(self.capture_and_send, endpoint)
+        future.add_done_callback(lambda _: self._pending.release())
+        return True
 
     def capture_and_send(self, endpoint: str):
-        url = self.server_base + endpoint
         with self.capture_lock:
-            ok = take_photo(self.photo_path, self.capture)
-        if not ok:
+            # OCR needs every pixel; captioning doesn't
+            jpeg_bytes = self._grab_jpeg(full_size=endpoint.startswith('/ocr'))
+        if jpeg_bytes is None:
             print('Failed to capture photo')
             return
 
+        url = self.server_base + endpoint
         try:
-            resp = upload_photo(self.photo_path, url)
+            try:
+                resp = upload_photo(self.session, jpeg_bytes, url)
+            except requests.ConnectionError:
+                # the server may have a new address; look it up again and retry once
+                self._resolve_server()
+                url = self.server_base + endpoint
+                resp = upload_photo(self.session, jpeg_bytes, url)
             # endpoint responses may vary: try common keys
             text = resp.get('caption') or resp.get('text') or resp.get('result') or resp.get('message')
             print(f"Response from {endpoint}: {text}")
             if text:
-                speak(str(text))
+                self.speak(str(text))
         except Exception as e:
             print(f"Error sending photo to {url}: {e}")
 
@@ -150,9 +401,9 @@ def setup_gpio(client: RPICaptureClient):
     def make_callback(endpoint):
         def cb(channel):
             print(f'Button on GPIO {channel} pressed -> {endpoint}')
-            # dispatch to background thread so callback returns quickly
-            t = threading.Thread(target=client.capture_and_send, args=(endpoint,), daemon=True)
-            t.start()
+            # dispatch to the upload pool so callback returns quickly
+            if not client.submit(endpoint):
+                print('Uploads still pending; ignoring press')
         return cb
 
     # add event detection with debounce
@@ -167,10 +418,17 @@ def setup_gpio(client: RPICaptureClient):
 
 
 def main():
+    parser = argparse.ArgumentParser(description='Raspberry Pi capture client')
+    parser.add_argument('--preview-size', type=parse_size, default=DEFAULT_PREVIEW_SIZE,
+                        help="WxH to downscale caption uploads to, or 'off' (default: 384x384; OCR uploads stay full size). "
+                             "Only applies to the OpenCV capture path: with GStreamer MJPEG passthrough or "
+                             "Jetson nvjpegenc every upload is sent at the camera resolution")
+    args = parser.parse_args()
+
     server_base = "http://specsserver.local"  # base URL (adjust if needed)
 
     try:
-        client = RPICaptureClient(server_base)
+        client = RPICaptureClient(server_base, preview_size=args.preview_size)
     except Exception as e:
         print(f'Camera initialization failed: {e}')
         return
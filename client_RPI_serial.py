@@ -10,6 +10,8 @@ Behavior:
     2 -> /traffic
     3 -> /search
 - Press q to quit.
+- With aiohttp installed (non-Windows), the next frame is captured while the
+  previous upload is in flight and captions are spoken in the background.
 
 Usage: run from a terminal on the Pi (or your desktop for testing). If RPi.GPIO
 is available it will not be used; this script relies on keyboard input only.
@@ -17,6 +19,7 @@ is available it will not be used; this script relies on keyboard input only.
 """
 
 import os
+import argparse
 import sys
 import time
 import select
@@ -29,12 +32,24 @@ try:
     import msvcrt
 except Exception:
     msvcrt = None
-import tempfile
 import subprocess
 import shutil
+import asyncio
 
 import requests
 import cv2 as cv
+import numpy as np
+
+import tts
+from client_common import (
+    DEFAULT_PREVIEW_SIZE, downscale, encode_jpeg, iter_chunks, make_session, parse_size, resolve_server,
+)
+
+# aiohttp lets capture, upload and speech overlap; without it the loop stays sequential
+try:
+    import aiohttp
+except Exception:
+    aiohttp = None
 
 # TTS helpers (reuse approach from other client): try gTTS then espeak
 try:
@@ -44,18 +59,28 @@ except Exception:
     gTTS = None
     playsound = None
 
-# Prefer espeak-ng Python bindings if available
+# espeak-ng Python bindings, used if libespeak-ng can't be loaded in-process (tts.py)
 try:
     from espeakng import ESpeakNG
     _esng = ESpeakNG()
 except Exception:
     _esng = None
 
+# Frames the V4L2 driver may still hold from before a capture was requested
+STALE_FRAMES = 4
+
 
 def speak(text: str):
     if not text:
         return
-    # Prefer espeak-ng Python bindings (blocking, in-process)
+    # Prefer libespeak-ng directly (blocking, in-process, releases the GIL)
+    try:
+        if tts.say(text):
+            return
+    except Exception:
+        pass
+
+    # Then the espeak-ng Python bindings
     try:
         if _esng is not None:
             _esng.say(text)
@@ -72,11 +97,11 @@ def speak(text: str):
         pass
 
 class SerialClient:
-    def __init__(self, server_base: str, camera_index=0):
-        self.server_base = server_base.rstrip('/')
-        self.photo_folder = os.path.join(tempfile.gettempdir(), 'rpi_serial_photos')
-        os.makedirs(self.photo_folder, exist_ok=True)
-        self.photo_path = os.path.join(self.photo_folder, 'latest.jpg')
+    def __init__(self, server_base: str, camera_index=0, preview_size=DEFAULT_PREVIEW_SIZE):
+        self._target = preview_size
+        self._configured_base = server_base.rstrip('/')
+        self._resolve_server()
+        self.session = make_session()
 
         try:
             self.capture = cv.VideoCapture(camera_index, cv.CAP_V4L2)
@@ -87,6 +112,8 @@ class SerialClient:
             self.capture.set(cv.CAP_PROP_FRAME_WIDTH, 640)
             self.capture.set(cv.CAP_PROP_FRAME_HEIGHT, 480)
             self.capture.set(cv.CAP_PROP_FOURCC, cv.VideoWriter_fourcc(*'MJPG'))
+            # keep only the newest frame queued in the driver
+            self.capture.set(cv.CAP_PROP_BUFFERSIZE, 1)
         except Exception:
             pass
 
@@ -97,47 +124,116 @@ class SerialClient:
         if not self.capture.isOpened():
             raise RuntimeError('Could not open camera')
 
+        # reusable frame buffer sized to what the driver actually negotiated
+        width = int(self.capture.get(cv.CAP_PROP_FRAME_WIDTH)) or 640
+        height = int(self.capture.get(cv.CAP_PROP_FRAME_HEIGHT)) or 480
+        self._frame = np.empty((height, width, 3), dtype=np.uint8)
+
+    def _resolve_server(self):
+        self.server_base = resolve_server(self._configured_base)
+
     def close(self):
         try:
             self.capture.release()
         except Exception:
             pass
+        self.session.close()
 
-    def take_photo(self):
-        ret, frame = self.capture.read()
+    def grab_jpeg(self, quality=80, full_size=False):
+        if not self.capture.grab():
+            return None
+        ret, frame = self.capture.retrieve(self._frame)
         if not ret or frame is None:
-            return False
-        cv.imwrite(self.photo_path, frame)
-        return True
+            return None
+        if not full_size:
+            frame = downscale(frame, self._target)
+        return encode_jpeg(frame, quality)
+
+    def _fatal(self, message: str):
+        print(message)
+        try:
+            self.close()
+        except Exception:
+            pass
+        # Exit the whole process with non-zero so a service manager can restart it
+        os._exit(1)
+
+    def _capture(self, endpoint: str):
+        # discard frames queued while we were uploading/speaking
+        for _ in range(STALE_FRAMES):
+            self.capture.grab()
+        # OCR needs every pixel; captioning doesn't
+        jpeg_bytes = self.grab_jpeg(full_size=endpoint.startswith('/ocr'))
+        if jpeg_bytes is None:
+            self._fatal('Failed to capture (fatal). Exiting so supervisor can restart.')
+        return jpeg_bytes
+
+    @staticmethod
+    def _response_text(endpoint: str, data: dict):
+        text = data.get('caption') or data.get('text') or data.get('result') or data.get('message')
+        print(f'Response from {endpoint}: {text}')
+        return text
+
+    def _post_sync(self, endpoint: str, jpeg_bytes: bytes):
+        return self.session.post(self.server_base + endpoint, data=iter_chunks(jpeg_bytes),
+                                 headers={'Content-Type': 'image/jpeg'}, timeout=30)
 
     def upload_and_speak(self):
-        url = self.server_base + self.current_endpoint
-        ok = self.take_photo()
-        if not ok:
-            print('Failed to capture (fatal). Exiting so supervisor can restart.')
-            try:
-                self.close()
-            except Exception:
-                pass
-            os._exit(1)
+        endpoint = self.current_endpoint
+        jpeg_bytes = self._capture(endpoint)
         try:
-            # Keep the file open while requests reads it by posting inside the with-block
-            with open(self.photo_path, 'rb') as f:
-                resp = requests.post(url, files={'file': f}, timeout=30)
+            try:
+                resp = self._post_sync(endpoint, jpeg_bytes)
+            except requests.ConnectionError:
+                # the server may have a new address; look it up again and retry once
+                self._resolve_server()
+                resp = self._post_sync(endpoint, jpeg_bytes)
             resp.raise_for_status()
-            data = resp.json()
-            text = data.get('caption') or data.get('text') or data.get('result') or data.get('message')
-            print(f'Response from {self.current_endpoint}: {text}')
+            text = self._response_text(endpoint, resp.json())
             if text:
                 speak(str(text))
         except Exception as e:
-            print(f'Upload error: {e}')
+            self._fatal(f'Upload error: {e}')
+
+    async def _post_async(self, http, endpoint: str, jpeg_bytes: bytes):
+        # same wire format as _post_sync: a raw image/jpeg body, no multipart framing
+        async with http.post(self.server_base + endpoint, data=jpeg_bytes,
+                             headers={'Content-Type': 'image/jpeg'}) as resp:
+            resp.raise_for_status()
+            return await resp.json(content_type=None)
+
+    async def _post(self, http, endpoint: str, jpeg_bytes: bytes, speech: asyncio.Queue):
+        try:
             try:
-                self.close()
-            except Exception:
-                pass
-            # Exit the whole process with non-zero so a service manager can restart it
-            os._exit(1)
+                data = await self._post_async(http, endpoint, jpeg_bytes)
+            except aiohttp.ClientConnectionError:
+                # the server may have a new address; look it up again and retry once
+                await asyncio.get_running_loop().run_in_executor(None, self._resolve_server)
+                data = await self._post_async(http, endpoint, jpeg_bytes)
+        except Exception as e:
+            self._fatal(f'Upload error: {e}')
+        text = self._response_text(endpoint, data)
+        if text:
+            # only the newest caption is worth speaking; drop one still waiting
+            if speech.full():
+                speech.get_nowait()
+            speech.put_nowait(str(text))
+
+    async def _speaker(self, speech: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        while True:
+            text = await speech.get()
+            await loop.run_in_executor(None, speak, text)
+
+    def _on_stdin(self):
+        line = sys.stdin.readline()
+        if not line:
+            # stdin closed; stop watching it
+            asyncio.get_running_loop().remove_reader(sys.stdin.fileno())
+            return
+        self._handle_key(line)
+        if self._stop:
+            self._stop_event.set()
 
     def _handle_key(self, ch: str):
         if not ch:
@@ -159,36 +255,13 @@ class SerialClient:
             print('Unknown key')
 
     def run_loop(self, interval=1.0):
-        print('Starting single-threaded upload loop. Press 1=/ocr, 2=/traffic, 3=/search for next upload. q to quit.')
-        use_select = hasattr(select, 'select') and msvcrt is None
         try:
-            while not self._stop:
-                # perform upload -> speak synchronously
-                self.upload_and_speak()
-
-                # wait for interval seconds but react to keypresses
-                end_time = time.time() + interval
-                while time.time() < end_time and not self._stop:
-                    # On Windows, use msvcrt for non-blocking key reads
-                    if msvcrt is not None:
-                        if msvcrt.kbhit():
-                            ch = msvcrt.getwch()
-                            self._handle_key(ch)
-                        else:
-                            time.sleep(0.1)
-                    elif use_select:
-                        timeout = max(0, end_time - time.time())
-                        r, _, _ = select.select([sys.stdin], [], [], min(0.1, timeout))
-                        if r:
-                            ch = sys.stdin.read(1)
-                            self._handle_key(ch)
-                    else:
-                        # fallback: blocking read (will likely pause loop)
-                        try:
-                            ch = sys.stdin.read(1)
-                            self._handle_key(ch)
-                        except Exception:
-                            time.sleep(0.1)
+            if aiohttp is not None and msvcrt is None:
+                print('Starting pipelined upload loop. Press 1=/ocr, 2=/traffic, 3=/search (then Enter) for next upload. q to quit.')
+                asyncio.run(self._run_async(interval))
+            else:
+                print('Starting single-threaded upload loop. Press 1=/ocr, 2=/traffic, 3=/search for next upload. q to quit.')
+                self._run_sync(interval)
         except KeyboardInterrupt:
             pass
         except Exception as e:
@@ -199,6 +272,75 @@ class SerialClient:
                 pass
             os._exit(1)
 
+    async def _run_async(self, interval):
+        """Capture the next frame while the previous one uploads, and speak in the background."""
+        loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        speech = asyncio.Queue(maxsize=1)
+        speaker = asyncio.create_task(self._speaker(speech))
+        try:
+            loop.add_reader(sys.stdin.fileno(), self._on_stdin)
+        except (OSError, ValueError) as e:
+            # epoll can't watch /dev/null or a regular file (e.g. stdin under systemd);
+            # keep uploading, just without key handling
+            print(f'Not watching stdin for keys: {e}')
+        upload = None
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as http:
+                while not self._stop:
+                    started = loop.time()
+                    endpoint = self.current_endpoint
+                    # OpenCV capture blocks, so keep it off the event loop
+                    jpeg_bytes = await loop.run_in_executor(None, self._capture, endpoint)
+                    # at most one upload in flight; the capture above overlapped the previous one
+                    if upload is not None:
+                        await upload
+                    upload = asyncio.create_task(self._post(http, endpoint, jpeg_bytes, speech))
+                    try:
+                        # only what the capture and previous upload left of the interval
+                        await asyncio.wait_for(self._stop_event.wait(), max(0.0, interval - (loop.time() - started)))
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            loop.remove_reader(sys.stdin.fileno())
+            for task in (upload, speaker):
+                if task is not None:
+                    task.cancel()
+
+    def _run_sync(self, interval):
+        use_select = hasattr(select, 'select') and msvcrt is None
+        while not self._stop:
+            # next upload is due one interval after this one started, however long it takes
+            end_time = time.time() + interval
+
+            # perform upload -> speak synchronously
+            self.upload_and_speak()
+
+            # wait for the rest of the interval but react to keypresses
+            while not self._stop:
+                remaining = end_time - time.time()
+                if remaining <= 0:
+                    break
+                # On Windows, use msvcrt for non-blocking key reads (the console can't be select()ed)
+                if msvcrt is not None:
+                    if msvcrt.kbhit():
+                        ch = msvcrt.getwch()
+                        self._handle_key(ch)
+                    else:
+                        time.sleep(min(0.1, remaining))
+                elif use_select:
+                    # sleep until a key arrives or the next upload is due
+                    r, _, _ = select.select([sys.stdin], [], [], remaining)
+                    if r:
+                        self._handle_key(sys.stdin.readline())
+                else:
+                    # fallback: blocking read (will likely pause loop)
+                    try:
+                        ch = sys.stdin.read(1)
+                        self._handle_key(ch)
+                    except Exception:
+                        time.sleep(0.1)
+
     def stop(self):
         self._stop = True
 
@@ -214,8 +356,13 @@ def read_key_nonblocking():
 
 
 def main():
+    parser = argparse.ArgumentParser(description='Keyboard-driven Raspberry Pi upload client')
+    parser.add_argument('--preview-size', type=parse_size, default=DEFAULT_PREVIEW_SIZE,
+                        help="WxH to downscale caption uploads to, or 'off' (default: 384x384; OCR uploads stay full size)")
+    args = parser.parse_args()
+
     server_base = 'http://specsserver.local'  # adjust if needed
-    client = SerialClient(server_base)
+    client = SerialClient(server_base, preview_size=args.preview_size)
     try:
         client.run_loop(interval=1.0)
     finally:
@@ -0,0 +1,87 @@
+"""Capture/upload helpers shared by the Raspberry Pi clients (client_RPI.py, client_RPI_serial.py).
+
+JPEG encoding (libjpeg-turbo when available), preview downscaling, the keep-alive
+upload session and chunked upload bodies, and pinning the server's .local name to
+its IP via announce_mdns.
+"""
+import requests
+from requests.adapters import HTTPAdapter
+import cv2 as cv
+
+# mDNS lookup of the server (needs zeroconf); without it every request resolves the name itself
+try:
+    from announce_mdns import resolve_base_url
+except Exception:
+    resolve_base_url = None
+
+# libjpeg-turbo encoder (SIMD/NEON); OpenCV's imencode is the fallback
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    _tj = TurboJPEG()
+except Exception:
+    _tj = None
+
+# Upload size for caption-style endpoints; the server's BLIP processors resize to 384x384 anyway
+DEFAULT_PREVIEW_SIZE = (384, 384)
+
+# Uploads are streamed as a raw image/jpeg body in slices of this size
+UPLOAD_CHUNK_SIZE = 16 * 1024
+
+
+def encode_jpeg(frame, quality=80):
+    """Return a BGR frame JPEG-encoded in memory, or None if encoding fails."""
+    if _tj is not None:
+        try:
+            return _tj.encode(frame, quality=quality, pixel_format=TJPF_BGR)
+        except Exception:
+            pass
+    ok, buf = cv.imencode('.jpg', frame, [cv.IMWRITE_JPEG_QUALITY, quality])
+    return buf.tobytes() if ok else None
+
+
+def parse_size(value: str):
+    """Parse 'WxH' into (w, h); 'off' disables downscaling."""
+    if value.lower() in ('off', 'none', '0'):
+        return None
+    w, h = value.lower().split('x')
+    return int(w), int(h)
+
+
+def downscale(frame, target):
+    """Shrink a frame to target (w, h) before encoding; frames already that small are returned as-is."""
+    if target is None or (frame.shape[1] <= target[0] and frame.shape[0] <= target[1]):
+        return frame
+    return cv.resize(frame, target, interpolation=cv.INTER_AREA)
+
+
+def make_session() -> requests.Session:
+    """Session that keeps the connection to the server alive between uploads."""
+    session = requests.Session()
+    session.headers['Connection'] = 'keep-alive'
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def iter_chunks(data: bytes, size=UPLOAD_CHUNK_SIZE):
+    """Yield data in slices so requests sends it with chunked Transfer-Encoding."""
+    view = memoryview(data)
+    for start in range(0, len(view), size):
+        yield view[start:start + size]
+
+
+def resolve_server(base_url: str) -> str:
+    """Pin the server's .local name to its IP so uploads skip the per-request mDNS lookup.
+
+    Returns base_url unchanged when zeroconf is missing or the lookup fails.
+    """
+    if resolve_base_url is None:
+        return base_url
+    resolved = base_url
+    try:
+        resolved = resolve_base_url(base_url)
+    except Exception as e:
+        print(f'Could not resolve {base_url}: {e}')
+    print(f'Using server {resolved}')
+    return resolved
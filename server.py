@@ -1,8 +1,17 @@
-import subprocess
-from flask import Flask, request, jsonify
+from flask import Flask, abort, jsonify, make_response, request
+from werkzeug.datastructures import FileStorage
+import functools
+import glob
+import hashlib
 import os
-import tempfile
-import traceback
+import re
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
 
 from transformers import AutoModelForVision2Seq, AutoProcessor
 
@@ -12,6 +21,11 @@ try:
 except Exception:
     cv2 = None
 
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+
 try:
     import easyocr
 except Exception:
@@ -25,18 +39,23 @@ except Exception:
     BlipProcessor = None
     BlipForConditionalGeneration = None
 
+# ONNX Runtime runs BLIP's vision encoder (int8) when no GPU is available
+try:
+    import onnxruntime as ort
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+except Exception:
+    ort = None
+
 try:
-    from googletrans import Translator
+    from deep_translator import GoogleTranslator
 except Exception:
-    Translator = None
+    GoogleTranslator = None
 
-# TTS imports (kept optional)
+# Production WSGI server (optional); falls back to Flask's threaded dev server
 try:
-    from gtts import gTTS
-    from playsound import playsound
+    from waitress import serve
 except Exception:
-    gTTS = None
-    playsound = None
+    serve = None
 
 app = Flask(__name__)
 
@@ -56,10 +75,44 @@ _models = {
     "blip_model": None,
     "traffic_blip_processor": None,
     "traffic_blip_model": None,
+    "blip_batcher": None,
+    "traffic_blip_batcher": None,
+    "blip_device": None,
+    "traffic_blip_device": None,
+    "blip_ort": None,
+    "traffic_blip_ort": None,
     "ocr_reader": None,
-    "translator": None,
 }
 
+# Micro-batching: caption requests arriving within BATCH_WAIT seconds of each other
+# share one model.generate call (up to MAX_BATCH images)
+MAX_BATCH = 8
+BATCH_WAIT = 0.015
+
+# Captions are short; capping decode steps keeps generate() latency bounded
+MAX_NEW_TOKENS = 32
+
+# Vision-encoder outputs kept per pixels, only while the two BLIPs share one encoder
+# (otherwise the per-model result cache already answers repeats); each BLIP-base entry
+# is ~0.9 MB in fp16 and lives on the model's device, so keep this modest
+EMBED_CACHE_SIZE = 64
+
+# Finished captions/OCR results remembered by image content, so a retry or repeated
+# upload of the same photo to the same endpoint doesn't rerun its model (entries are
+# per model, so nothing is shared between endpoints)
+RESULT_CACHE_SIZE = 256
+
+# Uploads are downscaled right after decode: BLIP only sees 384x384 anyway, while
+# OCR keeps more pixels because small text needs them
+MAX_CAPTION_EDGE = 1024
+MAX_OCR_EDGE = 2048
+
+# BLIP captions of similar scenes repeat a lot; remember their translations
+TRANSLATION_CACHE_SIZE = 4096
+# deep-translator rejects inputs longer than this; only longer texts are split
+TRANSLATE_MAX_CHARS = 5000
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
 
 # -------------------------
 # Utilities
@@ -72,70 +125,260 @@ def normalize_language(lang: str) -> str:
     return LANGUAGE_ALIASES.get(l, l)
 
 
-def save_upload_to_temp(upload) -> str:
-    """Save a Werkzeug FileStorage to a temporary file and return its path."""
-    suffix = os.path.splitext(upload.filename)[1] if upload and upload.filename else ""
-    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-        upload.save(tmp.name)
-        subprocess.run(["start","chrome", tmp.name], shell=True)
-        return tmp.name
+def preprocess_pil(image, max_edge: int):
+    """Downscale image so its longer edge is at most max_edge (never upscales)."""
+    w, h = image.size
+    scale = max_edge / max(w, h)
+    if scale >= 1:
+        return image
+    size = (max(1, int(w * scale)), max(1, int(h * scale)))
+    if cv2 is not None:
+        return Image.fromarray(cv2.resize(np.asarray(image), size, interpolation=cv2.INTER_AREA))
+    return image.resize(size, Image.BOX)
+
+
+def load_upload_to_pil(upload, max_edge: int = MAX_CAPTION_EDGE):
+    """Decode a Werkzeug FileStorage straight from its stream into an RGB PIL image,
+    downscaled to at most max_edge pixels on its longer side."""
+    image = Image.open(upload.stream)
+    # JPEGs can be decoded at 1/2, 1/4 or 1/8 scale directly by libjpeg
+    image.draft('RGB', (max_edge, max_edge))
+    return preprocess_pil(image.convert('RGB'), max_edge)
+
+
+def raw_image_upload():
+    """Wrap a raw image/* request body (e.g. a chunked upload) as a FileStorage, or return None."""
+    if not request.mimetype.startswith('image/'):
+        return None
+    return FileStorage(stream=request.stream, filename='upload.jpg', content_type=request.mimetype)
+
+
+def get_upload_pil(max_edge: int = MAX_CAPTION_EDGE):
+    """Return the request's image ('image' or 'file' form field, or a raw image/* body) as a
+    downscaled RGB PIL image; aborts with a JSON 400 if it is missing or unreadable."""
+    # FileStorage is falsy without a filename, so test membership rather than truthiness
+    if 'image' in request.files:
+        upload = request.files['image']
+    elif 'file' in request.files:
+        upload = request.files['file']
+    else:
+        upload = raw_image_upload()
+    if upload is None:
+        abort(make_response(jsonify({"error": "No image provided. Use multipart form 'image' or 'file', or a raw image/* body."}), 400))
+    try:
+        return load_upload_to_pil(upload, max_edge)
+    except Exception:
+        abort(make_response(jsonify({"error": "Could not read the uploaded image."}), 400))
 
 
 # -------------------------
 # Model initialization
 # -------------------------
 
-def init_translator():
-    if _models["translator"] is None:
-        if Translator is None:
-            _models["translator"] = None
-        else:
-            try:
-                _models["translator"] = Translator()
-            except Exception:
-                _models["translator"] = None
-    return _models["translator"]
+def has_triton() -> bool:
+    """True if torch.compile can build CUDA kernels here (Inductor needs Triton; often absent on Windows)."""
+    if not hasattr(torch, "compile"):
+        return False
+    try:
+        from torch.utils._triton import has_triton as _has_triton
+        return _has_triton()
+    except Exception:
+        return False
+
+
+def place_model(model):
+    """Move a model to CUDA in fp16 when available (fp32 on CPU) and return (device, dtype).
+
+    On CUDA the vision encoder is also wrapped in torch.compile.
+    """
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    dtype = torch.float16 if device == "cuda" else torch.float32
+    model.to(device=device, dtype=dtype)
+    model.eval()
+    if device == "cuda" and has_triton() and hasattr(model, "vision_model"):
+        # Fixed 384x384 input lets Inductor fuse the vision encoder; the text decoder stays
+        # eager because its sequence length changes every step. No CUDA graphs: the encoder
+        # is called from both batcher threads, and CUDA-graph trees are per-thread state.
+        # Compilation happens on the first call; encode_images marks the batch dimension
+        # dynamic so micro-batches of any size reuse one graph (plus one for size 1), and
+        # CaptionBatcher falls back to the eager encoder if the compiled one fails.
+        try:
+            model.vision_model = torch.compile(model.vision_model, fullgraph=False)
+        except Exception as e:
+            print(f'torch.compile unavailable, vision encoder stays eager: {e}')
+    return device, dtype
+
+
+def export_blip_onnx(model, processor, path: str):
+    """Export BLIP's vision encoder to ONNX plus an int8-quantized copy (once) and return an ORT session."""
+    path_int8 = os.path.splitext(path)[0] + ".int8.onnx"
+    if not os.path.exists(path_int8):
+        class VisionEncoder(torch.nn.Module):
+            def __init__(self, vision_model):
+                super().__init__()
+                self.vision_model = vision_model
+
+            def forward(self, pixel_values):
+                return self.vision_model(pixel_values=pixel_values, return_dict=False)[0]
+
+        size = processor.image_processor.size
+        dummy = torch.zeros(1, 3, size["height"], size["width"])
+        torch.onnx.export(
+            VisionEncoder(model.vision_model), (dummy,), path,
+            input_names=["pixel_values"], output_names=["image_embeds"],
+            dynamic_axes={"pixel_values": {0: "B"}, "image_embeds": {0: "B"}},
+            opset_version=17,
+        )
+        quantize_dynamic(path, path_int8, weight_type=QuantType.QInt8)
+    return ort.InferenceSession(path_int8, providers=["CPUExecutionProvider"])
+
+
+def weights_fingerprint(model_dir: str) -> str:
+    """Short key that changes whenever the checkpoint's weight or config files are replaced."""
+    h = hashlib.blake2b(digest_size=8)
+    for path in sorted(glob.glob(os.path.join(model_dir, "*.safetensors")) +
+                       glob.glob(os.path.join(model_dir, "*.bin")) +
+                       glob.glob(os.path.join(model_dir, "config.json"))):
+        st = os.stat(path)
+        h.update(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns};".encode())
+    return h.hexdigest()
+
+
+def init_blip_ort(model, processor, model_dir: str):
+    """ORT session for the vision encoder on CPU-only hosts, or None to stay on PyTorch.
+
+    The ONNX files are named after the checkpoint's fingerprint, so a retrained or replaced
+    model is re-exported instead of pairing a stale encoder with the new text decoder.
+    """
+    if ort is None or torch.cuda.is_available() or not hasattr(model, "text_decoder"):
+        return None
+    try:
+        path = os.path.join(model_dir, f"vision_encoder-{weights_fingerprint(model_dir)}.onnx")
+        for stale in glob.glob(os.path.join(model_dir, "vision_encoder*.onnx")):
+            if stale not in (path, os.path.splitext(path)[0] + ".int8.onnx"):
+                os.remove(stale)
+        return export_blip_onnx(model, processor, path)
+    except Exception as e:
+        print(f'ONNX export of {model_dir} failed, using PyTorch: {e}')
+        return None
+
+
+def _vision_config(model) -> dict:
+    return {k: v for k, v in model.config.vision_config.to_dict().items()
+            if not k.startswith("_") and k != "transformers_version"}
+
+
+def share_vision_encoder():
+    """Once both BLIPs are loaded, let the traffic model reuse the caption model's vision encoder
+    if the two are identical (same config and weights, e.g. the backbone was frozen while
+    fine-tuning). Both batchers then share embed-cache entries and one copy of the weights.
+    """
+    blip, traffic = _models["blip_model"], _models["traffic_blip_model"]
+    if blip is None or traffic is None or _models["traffic_blip_batcher"] is None:
+        return
+    if not hasattr(traffic, "vision_model") or traffic.vision_model is blip.vision_model:
+        return
+    try:
+        if _vision_config(blip) != _vision_config(traffic):
+            return
+        a, b = blip.vision_model.state_dict(), traffic.vision_model.state_dict()
+        if a.keys() != b.keys() or not all(torch.equal(a[k], b[k]) for k in a):
+            return
+    except Exception:
+        return
+    traffic.vision_model = blip.vision_model
+    _models["traffic_blip_ort"] = _models["blip_ort"]
+    batcher = _models["traffic_blip_batcher"]
+    batcher.ort_session = _models["blip_ort"]
+    # a photo sent to both /caption and /traffic now needs the encoder only once
+    batcher.vision_key = _models["blip_batcher"].vision_key = "blip"
+    print('Traffic model shares the caption model\'s vision encoder')
+
+
+# Serialises lazy model loading: concurrent first requests would otherwise each load a
+# copy onto the GPU, start their own batcher thread and write the same ONNX files
+_init_lock = threading.Lock()
+
+
+# GoogleTranslator keeps per-call state on the instance, so each server thread gets
+# its own instance per target language
+_translators = threading.local()
+
+
+def init_translator(target_lang: str):
+    """Return this thread's GoogleTranslator for en -> target_lang, or None if unavailable."""
+    if GoogleTranslator is None:
+        return None
+    by_lang = getattr(_translators, "by_lang", None)
+    if by_lang is None:
+        by_lang = _translators.by_lang = {}
+    if target_lang not in by_lang:
+        try:
+            by_lang[target_lang] = GoogleTranslator(source="en", target=target_lang)
+        except Exception:
+            by_lang[target_lang] = None
+    return by_lang[target_lang]
 
 
 def init_blip():
     if _models["blip_model"] is None or _models["blip_processor"] is None:
-        if BlipProcessor is None or BlipForConditionalGeneration is None or torch is None:
-            _models["blip_processor"] = None
-            _models["blip_model"] = None
-            return None, None
-        try:
-            _models["blip_processor"] = BlipProcessor.from_pretrained("./vlms/final_model")
-            _models["blip_model"] = BlipForConditionalGeneration.from_pretrained("./vlms/final_model")
-            _models["blip_model"].eval()
-        except Exception:
-            _models["blip_processor"] = None
-            _models["blip_model"] = None
+        with _init_lock:
+            # another request may have finished loading while this one waited
+            if _models["blip_model"] is not None and _models["blip_processor"] is not None:
+                return _models["blip_processor"], _models["blip_model"]
+            if BlipProcessor is None or BlipForConditionalGeneration is None or torch is None or Image is None:
+                return None, None
+            try:
+                processor = BlipProcessor.from_pretrained("./vlms/final_model")
+                model = BlipForConditionalGeneration.from_pretrained("./vlms/final_model")
+                device, dtype = place_model(model)
+                ort_session = init_blip_ort(model, processor, "./vlms/final_model")
+                batcher = CaptionBatcher(processor, model, device, dtype, ort_session)
+            except Exception:
+                return None, None
+            _models["blip_device"] = device
+            _models["blip_ort"] = ort_session
+            _models["blip_batcher"] = batcher
+            # publish the model last: callers take a loaded model to mean the batcher exists
+            _models["blip_processor"] = processor
+            _models["blip_model"] = model
+            share_vision_encoder()
     return _models["blip_processor"], _models["blip_model"]
 
 def init_traffic_blip():
     if _models["traffic_blip_model"] is None or _models["traffic_blip_processor"] is None:
-        if BlipProcessor is None or BlipForConditionalGeneration is None or torch is None:
-            _models["traffic_blip_processor"] = None
-            _models["traffic_blip_model"] = None
-            return None, None
-        try:
-            _models["traffic_blip_processor"] = AutoProcessor.from_pretrained("./final_model")
-            _models["traffic_blip_model"] = AutoModelForVision2Seq.from_pretrained("./final_model")
-            _models["traffic_blip_model"].eval()
-        except Exception:
-            _models["traffic_blip_processor"] = None
-            _models["traffic_blip_model"] = None
+        with _init_lock:
+            if _models["traffic_blip_model"] is not None and _models["traffic_blip_processor"] is not None:
+                return _models["traffic_blip_processor"], _models["traffic_blip_model"]
+            if BlipProcessor is None or BlipForConditionalGeneration is None or torch is None or Image is None:
+                return None, None
+            try:
+                processor = AutoProcessor.from_pretrained("./final_model")
+                model = AutoModelForVision2Seq.from_pretrained("./final_model")
+                device, dtype = place_model(model)
+                ort_session = init_blip_ort(model, processor, "./final_model")
+                batcher = CaptionBatcher(processor, model, device, dtype, ort_session)
+            except Exception:
+                return None, None
+            _models["traffic_blip_device"] = device
+            _models["traffic_blip_ort"] = ort_session
+            _models["traffic_blip_batcher"] = batcher
+            _models["traffic_blip_processor"] = processor
+            _models["traffic_blip_model"] = model
+            share_vision_encoder()
     return _models["traffic_blip_processor"], _models["traffic_blip_model"]
 
 def init_ocr():
     if _models["ocr_reader"] is None:
         if easyocr is None:
-            _models["ocr_reader"] = None
             return None
-        try:
-            _models["ocr_reader"] = easyocr.Reader(["en"], gpu=False)
-        except Exception:
-            _models["ocr_reader"] = None
+        with _init_lock:
+            if _models["ocr_reader"] is None:
+                try:
+                    gpu = torch is not None and torch.cuda.is_available()
+                    _models["ocr_reader"] = easyocr.Reader(["en"], gpu=gpu)
+                except Exception:
+                    _models["ocr_reader"] = None
     return _models["ocr_reader"]
 
 
@@ -143,61 +386,265 @@ def init_ocr():
 # Core processing functions
 # -------------------------
 
-def generate_caption_from_image_path(image_path: str) -> tuple[str, float]:
+def generate_from_embeds(model, image_embeds, **gen_kwargs):
+    """Run BLIP's text decoder on precomputed vision embeddings (what BlipForConditionalGeneration.generate does)."""
+    text_config = model.config.text_config
+    batch_size = image_embeds.shape[0]
+    input_ids = torch.full((batch_size, 1), text_config.bos_token_id, dtype=torch.long, device=image_embeds.device)
+    attention_mask = torch.ones(image_embeds.shape[:-1], dtype=torch.long, device=image_embeds.device)
+    return model.text_decoder.generate(
+        input_ids=input_ids,
+        eos_token_id=text_config.sep_token_id,
+        pad_token_id=text_config.pad_token_id,
+        encoder_hidden_states=image_embeds,
+        encoder_attention_mask=attention_mask,
+        **gen_kwargs,
+    )
+
+
+class LRUCache:
+    """Small thread-safe LRU mapping; used for vision embeddings and for finished results."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+# (shared vision key, pixel_values digest) -> image_embeds
+_embed_cache = LRUCache(EMBED_CACHE_SIZE)
+# (model name, decoded-image digest) -> (text, confidence); pixel-identical images
+# always get the same answer, so entries never need invalidating
+_result_cache = LRUCache(RESULT_CACHE_SIZE)
+
+
+def image_digest(image) -> bytes:
+    """Content hash of a decoded image (PIL or ndarray) for the result cache."""
+    return hashlib.blake2b(np.asarray(image).tobytes(), digest_size=16).digest()
+
+
+def encode_images(model, pixel_values, ort_session=None):
+    """Run the vision encoder (ORT when given, else PyTorch) and return image_embeds."""
+    if ort_session is not None:
+        (embeds,) = ort_session.run(None, {"pixel_values": pixel_values.cpu().numpy()})
+        return torch.from_numpy(embeds)
+    if hasattr(model.vision_model, "_orig_mod"):
+        # compiled encoder: one graph for every micro-batch size instead of one each
+        torch._dynamo.maybe_mark_dynamic(pixel_values, 0)
+    return model.vision_model(pixel_values=pixel_values, return_dict=False)[0]
+
+
+def caption_batch(processor, model, images, device="cpu", dtype=None, ort_session=None,
+                  vision_key=None) -> list[str]:
+    """Caption a list of PIL images with a single generate call on the model's device.
+
+    For BLIP models the vision encoder (in ONNX Runtime when an ORT session is given)
+    feeds the text decoder directly. With a vision_key (set once the encoder is shared
+    between models) it only runs for images whose pixels aren't in the embed cache.
+    """
+    if not hasattr(model, "text_decoder"):
+        inputs = {
+            k: v.to(device, dtype=dtype if dtype is not None and v.is_floating_point() else v.dtype)
+            for k, v in processor(images=images, return_tensors="pt").items()
+        }
+        with torch.inference_mode():
+            output = model.generate(**inputs, num_beams=1, max_new_tokens=MAX_NEW_TOKENS)
+        return [c.strip() for c in processor.batch_decode(output, skip_special_tokens=True)]
+
+    pixel_values = processor(images=images, return_tensors="pt")["pixel_values"]
+    if vision_key is None:
+        with torch.inference_mode():
+            embeds = encode_images(model, pixel_values.to(device, dtype=dtype), ort_session)
+            output = generate_from_embeds(model, embeds, num_beams=1, max_new_tokens=MAX_NEW_TOKENS)
+        return [c.strip() for c in processor.batch_decode(output, skip_special_tokens=True)]
+
+    keys = [(vision_key, hashlib.blake2b(row.numpy().tobytes(), digest_size=16).digest()) for row in pixel_values]
+    embeds = [_embed_cache.get(key) for key in keys]
+    missing = [i for i, e in enumerate(embeds) if e is None]
+    with torch.inference_mode():
+        if missing:
+            new = encode_images(model, pixel_values[missing].to(device, dtype=dtype), ort_session)
+            for i, e in zip(missing, new):
+                # clone so the cache doesn't pin the whole batch tensor
+                embeds[i] = e.clone()
+                _embed_cache.put(keys[i], embeds[i])
+        output = generate_from_embeds(model, torch.stack(embeds), num_beams=1, max_new_tokens=MAX_NEW_TOKENS)
+    return [c.strip() for c in processor.batch_decode(output, skip_special_tokens=True)]
+
+
+class CaptionBatcher:
+    """Queue images from concurrent requests and caption them together on a background thread.
+
+    One batcher exists per model; callers block on the Future returned by submit().
+    """
+
+    def __init__(self, processor, model, device="cpu", dtype=None, ort_session=None, vision_key=None,
+                 max_batch: int = MAX_BATCH, max_wait: float = BATCH_WAIT):
+        self.processor = processor
+        self.model = model
+        self.device = device
+        self.dtype = dtype
+        self.ort_session = ort_session
+        # embed-cache namespace; set by share_vision_encoder, None means no embed caching
+        self.vision_key = vision_key
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, image) -> Future:
+        fut = Future()
+        self._queue.put((image, fut))
+        return fut
+
+    def _collect(self) -> list:
+        # block for the first item, then take whatever else arrives within max_wait
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            images = [image for image, _ in batch]
+            encoder = getattr(self.model, "vision_model", None)
+            try:
+                captions = caption_batch(self.processor, self.model, images,
+                                         self.device, self.dtype, self.ort_session, self.vision_key)
+            except Exception as e:
+                captions = None
+                if hasattr(encoder, "_orig_mod"):
+                    # torch.compile fails lazily (e.g. no C compiler); go eager for good and retry
+                    print(f'Compiled vision encoder failed, using eager: {e}')
+                    use_eager_vision_encoder(self.model)
+                    try:
+                        captions = caption_batch(self.processor, self.model, images,
+                                                 self.device, self.dtype, self.ort_session, self.vision_key)
+                    except Exception as retry_error:
+                        e = retry_error
+                if captions is None:
+                    for _, fut in batch:
+                        fut.set_exception(e)
+                    continue
+            for (_, fut), caption in zip(batch, captions):
+                fut.set_result(caption)
+
+
+def generate_caption_from_pil(image) -> tuple[str, float]:
     """Return (caption, confidence). If BLIP unavailable, return a sample caption."""
     processor, model = init_blip()
     if processor is None or model is None:
         return ("A sample caption describing the scene.", 0.5)
 
+    key = ("blip", image_digest(image))
+    cached = _result_cache.get(key)
+    if cached is not None:
+        return cached
     try:
-        from PIL import Image
-        image = Image.open(image_path).convert('RGB')
-        inputs = processor(images=image, return_tensors="pt")
-        with torch.no_grad():
-            output = model.generate(**inputs)
-        caption = processor.decode(output[0], skip_special_tokens=True)
+        caption = _models["blip_batcher"].submit(image).result()
+        _result_cache.put(key, (caption, 0.85))
         return caption, 0.85
     except Exception:
         return ("A sample caption describing the scene.", 0.5)
 
 
-def generate_traffic_caption_from_image_path(image_path: str) -> tuple[str, float]:
+def generate_traffic_caption_from_pil(image) -> tuple[str, float]:
     """Return (caption, confidence). If BLIP unavailable, return a sample caption."""
     processor, model = init_traffic_blip()
     if processor is None or model is None:
         return ("A sample caption describing the scene.", 0.5)
 
+    key = ("traffic_blip", image_digest(image))
+    cached = _result_cache.get(key)
+    if cached is not None:
+        return cached
     try:
-        from PIL import Image
-        image = Image.open(image_path).convert('RGB')
-        inputs = processor(images=image, return_tensors="pt")
-        with torch.no_grad():
-            output = model.generate(**inputs)
-        caption = processor.decode(output[0], skip_special_tokens=True)
+        caption = _models["traffic_blip_batcher"].submit(image).result()
+        _result_cache.put(key, (caption, 0.85))
         return caption, 0.85
     except Exception:
         return ("A sample caption describing the scene.", 0.5)
 
 
-def ocr_from_image_path(image_path: str) -> tuple[str, float]:
+def ocr_from_array(arr: np.ndarray) -> tuple[str, float]:
+    """OCR an RGB (or BGR) uint8 array already in memory; easyocr then skips its own decode."""
     reader = init_ocr()
     if reader is None:
         # fallback sample
         return ("Sample OCR: The quick brown fox jumps over the lazy dog.", 0.8)
+    key = ("ocr", image_digest(arr))
+    cached = _result_cache.get(key)
+    if cached is not None:
+        return cached
     try:
-        result = reader.readtext(image_path)
+        result = reader.readtext(arr)
         text = " ".join([t[1] for t in result])
+        _result_cache.put(key, (text, 0.9))
         return text or "", 0.9
     except Exception:
         return ("", 0.0)
 
 
+@functools.lru_cache(maxsize=TRANSLATION_CACHE_SIZE)
+def _translate_cached(text: str, target_lang: str) -> str:
+    # Raises on failure so a failed lookup is never cached
+    return init_translator(target_lang).translate(text)
+
+
+def split_for_translation(text: str, limit: int = TRANSLATE_MAX_CHARS) -> list[str]:
+    """Return text as one piece, or for texts over limit, sentences packed into chunks of at most limit chars."""
+    if len(text) <= limit:
+        return [text]
+    chunks, current = [], ""
+    for sentence in SENTENCE_SPLIT.split(text.strip()):
+        # a single sentence over the limit is cut where it must be
+        while len(sentence) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:limit])
+            sentence = sentence[limit:]
+        if current and len(current) + 1 + len(sentence) > limit:
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+
 def translate_text(text: str, target_lang: str) -> str:
-    translator = init_translator()
-    if translator is None:
+    # BLIP and easyocr already produce English
+    if target_lang == "en" or not text:
+        return text
+    if init_translator(target_lang) is None:
         return text
     try:
-        return translator.translate(text, dest=target_lang).text
+        return " ".join(_translate_cached(chunk, target_lang) for chunk in split_for_translation(text))
     except Exception:
         return text
 
@@ -213,65 +660,39 @@ def caption_endpoint(lang):
 
     if request.method == 'GET':
         return jsonify({
-            "help": "POST an image as multipart form-data ('image' or 'file') to receive a caption.",
+            "help": "POST an image as multipart form-data ('image' or 'file') or as a raw image/* body to receive a caption.",
             "example": {"curl": "curl -X POST -F \"image=@/path/photo.jpg\" http://localhost:5000/caption/en"}
         })
 
-    upload = None
-    if 'image' in request.files:
-        upload = request.files['image']
-    elif 'file' in request.files:
-        upload = request.files['file']
-    else:
-        return jsonify({"error": "No image provided. Use multipart form 'image' or 'file'."}), 400
+    image = get_upload_pil()
 
-    tmp = save_upload_to_temp(upload)
-    try:
-        caption, conf = generate_caption_from_image_path(tmp)
-        translated = translate_text(caption, target_lang)
-        return jsonify({
-            "caption": translated,
-            "caption_en": caption,
-            "confidence": conf,
-            "language": target_lang,
-        })
-    finally:
-        try:
-            os.remove(tmp)
-        except Exception:
-            pass
+    caption, conf = generate_caption_from_pil(image)
+    translated = translate_text(caption, target_lang)
+    return jsonify({
+        "caption": translated,
+        "caption_en": caption,
+        "confidence": conf,
+        "language": target_lang,
+    })
 
 @app.route('/traffic', methods=['GET', 'POST'])
 def traffic_endpoint():
     """POST an image (multipart form 'image' or 'file') and receive traffic-related information."""
     if request.method == 'GET':
         return jsonify({
-            "help": "POST an image as multipart form-data ('image' or 'file') to receive traffic-related information.",
+            "help": "POST an image as multipart form-data ('image' or 'file') or as a raw image/* body to receive traffic-related information.",
             "example": {"curl": "curl -X POST -F \"image=@/path/photo.jpg\" http://localhost:5000/traffic"}
         })
 
-    upload = None
-    if 'image' in request.files:
-        upload = request.files['image']
-    elif 'file' in request.files:
-        upload = request.files['file']
-    else:
-        return jsonify({"error": "No image provided. Use multipart form 'image' or 'file'."}), 400
+    image = get_upload_pil()
 
-    tmp = save_upload_to_temp(upload)
-    try:
-        caption, conf = generate_traffic_caption_from_image_path(tmp)
-        return jsonify({
-            "caption": caption,
-            "caption_en": caption,
-            "confidence": conf,
-            "language": "en",
-        })
-    finally:
-        try:
-            os.remove(tmp)
-        except Exception:
-            pass
+    caption, conf = generate_traffic_caption_from_pil(image)
+    return jsonify({
+        "caption": caption,
+        "caption_en": caption,
+        "confidence": conf,
+        "language": "en",
+    })
 
 
 @app.route('/ocr/<lang>', methods=['GET', 'POST'])
@@ -281,39 +702,69 @@ def ocr_endpoint(lang):
 
     if request.method == 'GET':
         return jsonify({
-            "help": "POST an image as multipart form-data ('image' or 'file') to receive OCR text.",
+            "help": "POST an image as multipart form-data ('image' or 'file') or as a raw image/* body to receive OCR text.",
             "example": {"curl": "curl -X POST -F \"image=@/path/photo.jpg\" http://localhost:5000/ocr/en"}
         })
 
-    upload = None
-    if 'image' in request.files:
-        upload = request.files['image']
-    elif 'file' in request.files:
-        upload = request.files['file']
-    else:
-        return jsonify({"error": "No image provided. Use multipart form 'image' or 'file'."}), 400
+    image = get_upload_pil(MAX_OCR_EDGE)
 
-    tmp = save_upload_to_temp(upload)
-    try:
-        text, conf = ocr_from_image_path(tmp)
-        translated = translate_text(text, target_lang)
-        return jsonify({
-            "text": translated,
-            "text_en": text,
-            "confidence": conf,
-            "language": target_lang,
-        })
-    finally:
-        try:
-            os.remove(tmp)
-        except Exception:
-            pass
+    text, conf = ocr_from_array(np.array(image))
+    translated = translate_text(text, target_lang)
+    return jsonify({
+        "text": translated,
+        "text_en": text,
+        "confidence": conf,
+        "language": target_lang,
+    })
 
 
 # -------------------------
 # Run server (CLI)
 # -------------------------
-def create_app():
+def use_eager_vision_encoder(model) -> bool:
+    """Swap a torch.compile'd vision encoder back to the eager module (on every model sharing it).
+
+    Returns False if the encoder wasn't compiled.
+    """
+    compiled = getattr(model, "vision_model", None)
+    eager = getattr(compiled, "_orig_mod", None)
+    if eager is None:
+        return False
+    for key in ("blip_model", "traffic_blip_model"):
+        if _models[key] is not None and _models[key].vision_model is compiled:
+            _models[key].vision_model = eager
+    return True
+
+
+def warmup_models():
+    """Load every model now and run one dummy inference each, so no request pays the cold start."""
+    for name, init in (("blip", init_blip), ("traffic_blip", init_traffic_blip)):
+        processor, model = init()
+        if processor is None or model is None:
+            print(f'Warm-up: {name} unavailable')
+            continue
+        batcher = _models[f"{name}_batcher"]
+        try:
+            # a single image, then a full micro-batch: compiles both encoder graphs
+            # (size 1 and dynamic batch) before any request needs them
+            batcher.submit(Image.new('RGB', (384, 384))).result()
+            for fut in [batcher.submit(Image.new('RGB', (384, 384))) for _ in range(MAX_BATCH)]:
+                fut.result()
+            print(f'Warm-up: {name} ready')
+        except Exception as e:
+            print(f'Warm-up: {name} failed: {e}')
+    reader = init_ocr()
+    if reader is not None:
+        try:
+            reader.readtext(np.zeros((64, 64, 3), np.uint8))
+            print('Warm-up: ocr ready')
+        except Exception as e:
+            print(f'Warm-up: ocr failed: {e}')
+
+
+def create_app(warmup: bool = False):
+    if warmup:
+        warmup_models()
     return app
 
 
@@ -323,7 +774,14 @@ if __name__ == '__main__':
     parser.add_argument('--host', default='0.0.0.0')
     parser.add_argument('--port', type=int, default=80)
     parser.add_argument('--debug', action='store_true')
+    parser.add_argument('--warmup', action='store_true', help='Load all models and run a dummy inference before serving')
+    parser.add_argument('--threads', type=int, default=16, help='Worker threads; concurrent requests feed the caption batcher')
     args = parser.parse_args()
 
+    create_app(warmup=args.warmup)
+
     print('Starting server on %s:%s' % (args.host, args.port))
-    app.run(host=args.host, port=args.port, debug=args.debug)
\ No newline at end of file
+    if args.debug or serve is None:
+        app.run(host=args.host, port=args.port, debug=args.debug, threaded=True)
+    else:
+        serve(app, host=args.host, port=args.port, threads=args.threads)
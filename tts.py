@@ -0,0 +1,64 @@
+"""In-process espeak-ng speech via ctypes.
+
+Loads libespeak-ng and calls espeak_Synth directly, so speaking a phrase needs no
+subprocess or pipe. ctypes releases the GIL for the duration of the call, so other
+threads (and the serial client's event loop) keep running while audio plays.
+
+say(text) returns False when libespeak-ng isn't installed; callers then fall back
+to their own TTS options.
+"""
+import ctypes
+import ctypes.util
+import threading
+
+# Constants from espeak-ng's speak_lib.h
+AUDIO_OUTPUT_PLAYBACK = 0
+POS_CHARACTER = 1
+espeakCHARS_UTF8 = 1
+espeakENDPAUSE = 0x1000
+
+_lib = None
+_load_failed = False
+_lock = threading.Lock()
+
+
+def _load():
+    """Load and initialise libespeak-ng once; return the library or None if unavailable."""
+    global _lib, _load_failed
+    if _lib is not None or _load_failed:
+        return _lib
+    with _lock:
+        if _lib is not None or _load_failed:
+            return _lib
+        try:
+            lib = ctypes.CDLL(ctypes.util.find_library('espeak-ng') or 'libespeak-ng.so.1')
+            lib.espeak_Initialize.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
+            lib.espeak_SetVoiceByName.argtypes = [ctypes.c_char_p]
+            lib.espeak_Synth.argtypes = [
+                ctypes.c_char_p, ctypes.c_size_t, ctypes.c_uint, ctypes.c_int,
+                ctypes.c_uint, ctypes.c_uint, ctypes.POINTER(ctypes.c_uint), ctypes.c_void_p,
+            ]
+            if lib.espeak_Initialize(AUDIO_OUTPUT_PLAYBACK, 0, None, 0) < 0:
+                raise OSError('espeak_Initialize failed')
+            lib.espeak_SetVoiceByName(b'en')
+            _lib = lib
+        except Exception:
+            _load_failed = True
+    return _lib
+
+
+def available() -> bool:
+    return _load() is not None
+
+
+def say(text: str) -> bool:
+    """Speak text and block until playback finishes. Returns False if espeak-ng isn't available."""
+    lib = _load()
+    if lib is None:
+        return False
+    data = text.encode('utf-8')
+    with _lock:
+        lib.espeak_Synth(data, len(data) + 1, 0, POS_CHARACTER, 0,
+                         espeakCHARS_UTF8 | espeakENDPAUSE, None, None)
+        lib.espeak_Synchronize()
+    return True
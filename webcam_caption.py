@@ -15,9 +15,10 @@ model directory. If that fails it will attempt to POST the image to a local
 HTTP server at http://localhost:8000/predict. Adjust as needed for your setup.
 """
 import argparse
-import io
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 try:
@@ -28,14 +29,63 @@ except Exception:
 
 from PIL import Image
 
+# torchvision's v2 transforms run resize/normalize on the model's device; optional
+try:
+    from torchvision.transforms import v2 as T
+except Exception:
+    T = None
+
 def pil_from_bgr(bgr_frame):
     # Convert BGR (OpenCV) to RGB and create PIL image
     rgb = cv2.cvtColor(bgr_frame, cv2.COLOR_BGR2RGB)
     return Image.fromarray(rgb)
 
-def try_load_transformers(model_dir, device):
+def build_frame_transform(processor, torch_device):
+    """Return to_pixel_values(bgr_frame) -> tensor that preprocesses on torch_device, or None.
+
+    Mirrors the image processor's resize + rescale + normalize with torchvision v2 so a
+    uint8 frame goes to the device once and is preprocessed there, instead of
+    BGR -> PIL -> numpy preprocessing on the CPU. Returns None when torchvision or the
+    processor's settings aren't available; callers then use the processor as before.
+    """
+    import torch
+    ip = getattr(processor, 'image_processor', None)
+    size = getattr(ip, 'size', None) or {}
+    if T is None or ip is None or 'height' not in size or 'width' not in size:
+        return None
+    # PIL resample codes -> the tensor interpolations torchvision supports; BlipImageProcessor
+    # uses bicubic. Other filters (lanczos, box, ...) have no tensor equivalent.
+    modes = {0: T.InterpolationMode.NEAREST, 2: T.InterpolationMode.BILINEAR, 3: T.InterpolationMode.BICUBIC}
+    interpolation = modes.get(int(getattr(ip, 'resample', 3)))
+    if interpolation is None:
+        return None
+    transform = T.Compose([
+        T.Resize((size['height'], size['width']), interpolation=interpolation, antialias=True),
+        T.ToDtype(torch.float32, scale=True),
+        T.Normalize(mean=ip.image_mean, std=ip.image_std),
+    ])
+    cuda = torch_device.type == 'cuda'
+    copy_stream = torch.cuda.Stream(device=torch_device) if cuda else None
+
+    def to_pixel_values(bgr_frame):
+        t = torch.from_numpy(bgr_frame)
+        if cuda:
+            # pinned host buffer + side stream so the H2D copy is a real async DMA
+            with torch.cuda.stream(copy_stream):
+                t = t.pin_memory().to(torch_device, non_blocking=True)
+            torch.cuda.current_stream(torch_device).wait_stream(copy_stream)
+        # HWC BGR -> CHW RGB on the device
+        t = t.permute(2, 0, 1).flip(0)
+        return transform(t).unsqueeze(0)
+
+    return to_pixel_values
+
+def try_load_transformers(model_dir, device, num_beams=1, max_new_tokens=32):
     """Try to load HF-compatible vision-to-text model from model_dir.
-    Returns a callable caption(image: PIL.Image) -> str or None if can't load."""
+    Returns a callable caption(bgr_frame) -> str or None if can't load.
+
+    Decoding defaults to greedy (num_beams=1) with the KV cache, which is what a live
+    preview wants; raise num_beams / max_new_tokens for better captions."""
     import torch
     model_dir = str(Path(model_dir))
 
@@ -48,14 +98,18 @@ def try_load_transformers(model_dir, device):
         torch_device = torch.device('cuda' if device != 'cpu' and torch.cuda.is_available() else 'cpu')
         model.to(torch_device)
 
-        gen_kwargs = dict(max_length=64, num_beams=4)
+        gen_kwargs = dict(max_new_tokens=max_new_tokens, num_beams=num_beams, do_sample=False, use_cache=True)
+        if num_beams > 1:
+            gen_kwargs['early_stopping'] = True
+        to_pixel_values = build_frame_transform(processor, torch_device)
 
-        def caption(image: Image.Image) -> str:
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            inputs = processor(images=image, return_tensors='pt').to(torch_device)
+        def caption(bgr_frame) -> str:
             with torch.no_grad():
-                outputs = model.generate(**inputs, **gen_kwargs)
+                if to_pixel_values is not None:
+                    pixel_values = to_pixel_values(bgr_frame)
+                else:
+                    pixel_values = processor(images=pil_from_bgr(bgr_frame), return_tensors='pt').pixel_values.to(torch_device)
+                outputs = model.generate(pixel_values=pixel_values, **gen_kwargs)
             caption_text = processor.batch_decode(outputs, skip_special_tokens=True)[0]
             return caption_text.strip()
 
@@ -73,13 +127,15 @@ def try_load_transformers(model_dir, device):
         torch_device = torch.device('cuda' if device != 'cpu' and torch.cuda.is_available() else 'cpu')
         model.to(torch_device)
 
-        gen_kwargs = dict(max_length=64, num_beams=4)
+        gen_kwargs = dict(max_new_tokens=max_new_tokens, num_beams=num_beams, do_sample=False, use_cache=True)
+        to_pixel_values = build_frame_transform(processor, torch_device)
 
-        def caption(image: Image.Image) -> str:
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            pixel_values = processor(images=image, return_tensors='pt').pixel_values.to(torch_device)
+        def caption(bgr_frame) -> str:
             with torch.no_grad():
+                if to_pixel_values is not None:
+                    pixel_values = to_pixel_values(bgr_frame)
+                else:
+                    pixel_values = processor(images=pil_from_bgr(bgr_frame), return_tensors='pt').pixel_values.to(torch_device)
                 output_ids = model.generate(pixel_values, **gen_kwargs)
             caption_text = processor.batch_decode(output_ids, skip_special_tokens=True)[0]
             return caption_text.strip()
@@ -93,14 +149,17 @@ import base64
 import json
 import requests
 
-def caption_via_http(image: Image.Image, url: str):
-    # encode image to JPEG in-memory
-    buf = io.BytesIO()
-    image.save(buf, format='JPEG', quality=90)
-    buf.seek(0)
-    files = {'image': ('frame.jpg', buf, 'image/jpeg')}
+# one keep-alive connection to the caption server for the whole session
+_http = requests.Session()
+
+def caption_via_http(bgr_frame, url: str):
+    # encode the BGR frame to JPEG in-memory (OpenCV's libjpeg-turbo, no PIL round-trip)
+    ok, enc = cv2.imencode('.jpg', bgr_frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    if not ok:
+        return "HTTP request failed: could not encode frame"
+    files = {'image': ('frame.jpg', enc.tobytes(), 'image/jpeg')}
     try:
-        r = requests.post(url, files=files, timeout=30)
+        r = _http.post(url, files=files, timeout=30)
         r.raise_for_status()
         data = r.json()
         # expect {'caption': 'text'} or string
@@ -111,6 +170,25 @@ def caption_via_http(image: Image.Image, url: str):
         return str(data)
     except Exception as e:
         return f"HTTP request failed: {e}"
+def open_camera(index, width, height):
+    """Open the webcam with an explicit backend, MJPG pixel format and resolution (as in working.py).
+
+    Left to itself OpenCV often negotiates raw YUY2, which saturates USB bandwidth at
+    higher resolutions; MJPG lets the camera hold its frame rate.
+    """
+    if sys.platform == 'win32':
+        backend = cv2.CAP_DSHOW
+    elif sys.platform.startswith('linux'):
+        backend = cv2.CAP_V4L2
+    else:
+        backend = cv2.CAP_ANY
+    cap = cv2.VideoCapture(index, backend)
+    cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+    # keep the driver from queueing frames; the reader thread always wants the newest
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
 
 def main():
     parser = argparse.ArgumentParser()
@@ -119,40 +197,73 @@ def main():
     parser.add_argument('--interval', type=float, default=3.0, help='Interval seconds for auto mode')
     parser.add_argument('--device', choices=['cpu','cuda'], default='cpu', help='Device to run model on')
     parser.add_argument('--http_url', default='http://localhost:8000/predict', help='Fallback HTTP endpoint for captioning')
+    parser.add_argument('--width', type=int, default=640, help='Capture width in pixels')
+    parser.add_argument('--height', type=int, default=480, help='Capture height in pixels')
+    parser.add_argument('--num_beams', type=int, default=1, help='Beam width for decoding (1 = greedy, fastest)')
+    parser.add_argument('--max_new_tokens', type=int, default=32, help='Maximum caption length in tokens')
     parser.add_argument('--max_captures', type=int, default=0, help='Stop after this many captures (0 = unlimited)')
     args = parser.parse_args()
 
     model_dir = Path(args.model_dir)
 
-    caption_fn = try_load_transformers(model_dir, args.device)
+    caption_fn = try_load_transformers(model_dir, args.device, args.num_beams, args.max_new_tokens)
     if caption_fn is None:
         print("Falling back to HTTP endpoint at", args.http_url)
-        caption_fn = lambda img: caption_via_http(img, args.http_url)
+        caption_fn = lambda frame: caption_via_http(frame, args.http_url)
 
-    cap = cv2.VideoCapture(0)
+    cap = open_camera(0, args.width, args.height)
     if not cap.isOpened():
         print("Could not open webcam. If you're on Windows, ensure camera access permission is enabled.")
         sys.exit(1)
 
-    print("Press SPACE to capture, 'q' to quit. In --auto mode the script captures every --interval seconds.")
+    # Reader thread: keeps only the newest frame so the preview never lags behind
+    # inference. cap.read() allocates a fresh array each call, so handing out the
+    # reference is safe without copying.
+    latest = [None]
+    lock = threading.Lock()
+    fresh = threading.Event()
+    running = threading.Event()
+    running.set()
+    # the UI loop waits at most one frame period for a new frame, then still polls keys
+    frame_period = 1.0 / (cap.get(cv2.CAP_PROP_FPS) or 30.0)
 
-    last_auto = 0.0
-    captures_done = 0
-    try:
-        while True:
-            ret, frame = cap.read()
+    def grab():
+        while running.is_set():
+            ret, f = cap.read()
             if not ret:
                 print('Failed to read frame from webcam')
+                running.clear()
                 break
+            with lock:
+                latest[0] = f
+            fresh.set()
 
-            # show small preview window
-            cv2.imshow('webcam (press q to quit)', frame)
+    reader = threading.Thread(target=grab, daemon=True)
+    reader.start()
+    # one inference at a time; the preview keeps updating while it runs
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    print("Press SPACE to capture, 'q' to quit. In --auto mode the script captures every --interval seconds.")
+
+    last_auto = 0.0
+    captures_done = 0
+    frame = None
+    pending = None
+    pending_start = 0.0
+    try:
+        while running.is_set():
+            # redraw only when the reader has published a new frame; this also paces the
+            # loop at the camera's rate instead of spinning a core
+            if fresh.wait(frame_period):
+                fresh.clear()
+                with lock:
+                    frame = latest[0]
+                # show small preview window
+                cv2.imshow('webcam (press q to quit)', frame)
 
             now = time.time()
-            do_capture = False
-            if args.auto and (now - last_auto) >= args.interval:
-                do_capture = True
-                last_auto = now
+            auto_due = args.auto and (now - last_auto) >= args.interval
+            do_capture = auto_due
 
             key = cv2.waitKey(1) & 0xFF
             if key == ord('q'):
@@ -160,12 +271,13 @@ def main():
             if key == 32:  # space
                 do_capture = True
 
-            if do_capture:
-                pil = pil_from_bgr(frame)
-                print('\nCaptured frame, sending to model...')
-                start = time.time()
-                caption = caption_fn(pil)
-                elapsed = time.time() - start
+            if pending is not None and pending.done():
+                elapsed = time.time() - pending_start
+                try:
+                    caption = pending.result()
+                except Exception as e:
+                    caption = f'Captioning failed: {e}'
+                pending = None
                 print(f'Caption: {caption}')
                 print(f'(in {elapsed:.2f}s)')
                 captures_done += 1
@@ -173,7 +285,19 @@ def main():
                     print(f'Reached --max_captures={args.max_captures}, exiting.')
                     break
 
+            # drop the request rather than queue a stale frame behind a running one
+            if do_capture and frame is not None and pending is None:
+                print('\nCaptured frame, sending to model...')
+                pending_start = time.time()
+                pending = executor.submit(caption_fn, frame)
+                if auto_due:
+                    # only restart the interval once a capture was actually sent
+                    last_auto = now
+
     finally:
+        running.clear()
+        reader.join(timeout=1.0)
+        executor.shutdown(wait=True)
         cap.release()
         cv2.destroyAllWindows()
 
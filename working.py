@@ -1,3 +1,5 @@
+import sys
+
 import cv2
 
 def test_camera():
@@ -17,12 +19,20 @@ def test_camera():
         print("❌ Failed to capture image — try a different format or resolution.")
         return
 
-    filename = "test_image.jpg"
-    cv2.imwrite(filename, frame)
-    print(f"✅ Image saved as {filename}")
+    ok, buf = cv2.imencode(".jpg", frame)
+    if not ok or buf.nbytes == 0:
+        print("❌ Captured a frame but could not encode it as JPEG.")
+        cap.release()
+        return
+    print(f"✅ Frame {frame.shape} encoded to {buf.nbytes} bytes")
+
+    if "--save" in sys.argv:
+        filename = "test_image.jpg"
+        with open(filename, "wb") as f:
+            f.write(buf.tobytes())
+        print(f"✅ Image saved as {filename}")
 
     cap.release()
 
 if __name__ == "__main__":
     test_camera()
-this works write like this
\ No newline at end of file